@@ -1,12 +1,25 @@
 import json
 import torch
+import torch.multiprocessing as mp
 import os
+import time
+import argparse
+import platform
 from pathlib import Path
 from PIL import Image
 from geoclip.model import GeoCLIP
 
-# 1. Load GeoCLIP model
-model = GeoCLIP(from_pretrained=True)
+# 1. GeoCLIP model, loaded once on first use.
+# Worker processes get it from the parent (fork-after-load, or shared memory on Windows)
+# instead of loading their own copy.
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        model = GeoCLIP(from_pretrained=True)
+        model.eval()
+    return model
 
 # Get the directory of instascraper output
 instascraper_dir = Path("instascraper/output")
@@ -38,45 +51,142 @@ def predict_latlon(image_path, top_k=1):
     if not full_path.exists():
         raise FileNotFoundError(f"Image not found: {full_path}")
     
-    top_pred_gps, top_pred_prob = model.predict(str(full_path), top_k=top_k)
+    top_pred_gps, top_pred_prob = get_model().predict(str(full_path), top_k=top_k)
     
     # Return the top prediction
     lat, lon = top_pred_gps[0].tolist()
     return {"lat": float(lat), "lon": float(lon)}
 
-def process_json(json_path, output_path="Output/output.json"):
+def _init_worker(shared_model, num_threads):
+    """Runs once in each worker process: reuse the parent's model and split the cores"""
+    global model
+    model = shared_model
+    torch.set_num_threads(num_threads)
+
+def _predict_worker(image_path):
+    # Exceptions are returned as text so one bad image does not kill the whole pool
+    try:
+        return predict_latlon(image_path), None
+    except Exception as e:
+        return None, str(e)
+
+def usable_cores():
+    """Cores this process may actually run on (respects affinity / cgroup cpusets on Linux)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def threads_per_worker(workers):
+    """Give each worker an equal share of the cores so they do not fight over them"""
+    return max(1, usable_cores() // workers)
+
+def predict_many(image_paths, workers=1):
+    """
+    Predict locations for many images, split across worker processes.
+    Returns a list of (prediction, error) in the same order as image_paths.
+    """
+    if workers <= 1 or len(image_paths) <= 1:
+        return [_predict_worker(path) for path in image_paths]
+
+    shared_model = get_model()
+    # On Linux, fork lets workers inherit the loaded weights copy-on-write. fork is unsafe
+    # on macOS and missing on Windows, so there the weights are moved to shared memory
+    # and passed to spawned workers by handle.
+    if platform.system() == "Linux":
+        ctx = mp.get_context("fork")
+    else:
+        shared_model.share_memory()
+        ctx = mp.get_context("spawn")
+
+    chunksize = max(1, len(image_paths) // (workers * 4))
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(shared_model, threads_per_worker(workers))) as pool:
+        return pool.map(_predict_worker, image_paths, chunksize=chunksize)
+
+def _needs_prediction(entry):
+    return entry.get("location") is None or (isinstance(entry.get("location"), dict) and entry["location"].get("lat") is None)
+
+def process_json(json_path, output_path="Output/output.json", workers=1):
     """
     Fill missing lat/lon in JSON using GeoCLIP predictions.
     """
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    for entry in data:
-        if entry.get("location") is None or (isinstance(entry.get("location"), dict) and entry["location"].get("lat") is None):
-            # Get image paths
-            image_paths = entry.get("local_image_paths")
-            if image_paths:
-                try:
-                    prediction = predict_latlon(image_paths[0])
-                    entry["location"] = prediction
-                    print(f"[OK] Predicted location for {entry['post_url']}: {prediction}")
-                except Exception as e:
-                    print(f"[ERROR] Error processing {entry['post_url']}: {str(e)}")
-                    # Keep location as is if prediction fails
-                    if entry.get("location") is None:
-                        entry["location"] = {"lat": None, "lon": None}
+    # Collect every post that needs a prediction, then run them all in one go
+    pending = [entry for entry in data if _needs_prediction(entry) and entry.get("local_image_paths")]
+    results = predict_many([entry["local_image_paths"][0] for entry in pending], workers=workers)
+
+    for entry, (prediction, error) in zip(pending, results):
+        if error is None:
+            entry["location"] = prediction
+            print(f"[OK] Predicted location for {entry['post_url']}: {prediction}")
+        else:
+            print(f"[ERROR] Error processing {entry['post_url']}: {error}")
+            # Keep location as is if prediction fails
+            if entry.get("location") is None:
+                entry["location"] = {"lat": None, "lon": None}
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
     print(f"\nUpdated JSON saved to {output_path}")
 
+def benchmark(json_path, max_workers=None):
+    """
+    Time predictions for every post image at 1, 2, 4, ... workers and print images/sec.
+    Nothing is written to disk.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    image_paths = [entry["local_image_paths"][0] for entry in data if entry.get("local_image_paths")]
+    if not image_paths:
+        print("No images to benchmark!")
+        return
+
+    max_workers = max_workers or usable_cores()
+    worker_counts = []
+    n = 1
+    while n < max_workers:
+        worker_counts.append(n)
+        n *= 2
+    worker_counts.append(max_workers)
+
+    get_model()  # load before timing (and before forking)
+    # The single-process run goes last: forking after the parent has used torch's
+    # thread pool can hang some OpenMP builds.
+    rates, failures = {}, {}
+    for workers in sorted(worker_counts, reverse=True):
+        if workers == 1:
+            torch.set_num_threads(threads_per_worker(1))
+        start = time.perf_counter()
+        results = predict_many(image_paths, workers=workers)
+        elapsed = time.perf_counter() - start
+        # Failed images (e.g. missing files) return at once, so they must not count as throughput
+        succeeded = sum(1 for prediction, error in results if error is None)
+        rates[workers] = succeeded / elapsed
+        failures[workers] = len(results) - succeeded
+
+    print(f"GeoCLIP throughput for {len(image_paths)} images on {usable_cores()} cores")
+    for workers in worker_counts:
+        rate = rates[workers]
+        speedup = f"{rate / rates[1]:.2f}x" if rates[1] else "n/a"
+        failed = f", {failures[workers]} failed" if failures[workers] else ""
+        print(f"  {workers:>3} workers x {threads_per_worker(workers):>3} threads: {rate:7.2f} images/sec ({speedup}{failed})")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill missing post locations with GeoCLIP")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes for inference")
+    parser.add_argument("--benchmark", action="store_true", help="Report images/sec for 1, 2, 4, ... workers instead")
+    args = parser.parse_args()
+
     # Use the posts.json from instascraper output
     posts_json = "instascraper/output/json/posts.json"
     output_json = "output.json"
-    
-    process_json(posts_json, output_json)
+
+    if args.benchmark:
+        benchmark(posts_json)
+    else:
+        process_json(posts_json, output_json, workers=args.workers)
 
 
 
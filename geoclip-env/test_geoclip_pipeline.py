@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("geoclip")
+
+import geoclip_pipeline
+
+
+class FakeModel:
+    """Stands in for GeoCLIP: predicts (index, -index) from the file name, fails on 'bad' images"""
+
+    def predict(self, image_path, top_k=1):
+        name = image_path.rsplit("/", 1)[-1]
+        if name.startswith("bad"):
+            raise ValueError(f"cannot read {name}")
+        index = float(name.split("_")[1].split(".")[0])
+        return torch.tensor([[index, -index]]), torch.tensor([1.0])
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(geoclip_pipeline, "get_model", lambda: model)
+    return model
+
+
+def make_images(tmp_path, names):
+    paths = []
+    for name in names:
+        (tmp_path / name).write_bytes(b"")
+        paths.append(str(tmp_path / name))
+    return paths
+
+
+def test_predict_many_keeps_order_with_workers(tmp_path, fake_model):
+    names = [f"img_{i}.jpg" for i in range(7)]
+    names.insert(3, "bad_image.jpg")
+    paths = make_images(tmp_path, names)
+
+    results = geoclip_pipeline.predict_many(paths, workers=2)
+
+    assert len(results) == len(paths)
+    for name, (prediction, error) in zip(names, results):
+        if name.startswith("bad"):
+            assert prediction is None and "bad_image.jpg" in error
+        else:
+            index = float(name.split("_")[1].split(".")[0])
+            assert prediction == {"lat": index, "lon": -index} and error is None
+
+
+def test_process_json_matches_errors_to_posts(tmp_path, fake_model):
+    paths = make_images(tmp_path, ["img_1.jpg", "bad_image.jpg", "img_2.jpg"])
+    posts = [
+        {"post_url": "post-1", "local_image_paths": [paths[0]], "location": {"lat": None, "lon": None}},
+        {"post_url": "post-bad", "local_image_paths": [paths[1]], "location": None},
+        {"post_url": "post-tagged", "local_image_paths": [paths[1]], "location": {"lat": 5.0, "lon": 6.0}},
+        {"post_url": "post-2", "local_image_paths": [paths[2]], "location": {"lat": None, "lon": None}},
+    ]
+    posts_json = tmp_path / "posts.json"
+    posts_json.write_text(json.dumps(posts), encoding="utf-8")
+    output_json = tmp_path / "output.json"
+
+    geoclip_pipeline.process_json(str(posts_json), str(output_json), workers=2)
+
+    locations = {post["post_url"]: post["location"] for post in json.loads(output_json.read_text(encoding="utf-8"))}
+    assert locations == {
+        "post-1": {"lat": 1.0, "lon": -1.0},
+        "post-bad": {"lat": None, "lon": None},
+        "post-tagged": {"lat": 5.0, "lon": 6.0},
+        "post-2": {"lat": 2.0, "lon": -2.0},
+    }
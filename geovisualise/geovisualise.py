@@ -13,6 +13,7 @@ import webbrowser
 import os
 import base64
 from datetime import datetime
+from reverse_geocode import GAZETTEER_FILE, ReverseGeocoder, label_posts
 
 def load_posts(json_file):
     """Load posts from JSON file"""
@@ -28,6 +29,12 @@ def image_to_base64(image_path):
         print(f"  Error converting image {image_path}: {e}")
         return None
 
+def format_place(place):
+    """Turn a reverse geocoded place into 'City, Country'"""
+    if not place:
+        return ''
+    return f"{place['city']}, {place['country']}"
+
 def parse_date(date_str):
     """Parse date string to datetime object"""
     try:
@@ -80,6 +87,7 @@ def create_map(posts, output_file='social_media_map.html'):
         post_url = post.get('post_url', '')
         post_caption = post.get('caption', '')
         post_date = post.get('date', '')
+        place_display = format_place(post.get('place'))
         
         print(f"Processing post {i}/{len(posts_with_dates)}")
         
@@ -110,6 +118,7 @@ def create_map(posts, output_file='social_media_map.html'):
                 </div>
                 <div style="padding: 15px;">
                     {f'<p style="margin: 0 0 12px 0; font-size: 14px; line-height: 1.5; color: #262626;">{caption_display}</p>' if caption_display else ''}
+                    {f'<p style="margin: 5px 0; font-size: 12px; color: #8e8e8e;">📍 {place_display.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")}</p>' if place_display else ''}
                     <p style="margin: 5px 0; font-size: 12px; color: #8e8e8e;">🌍 {lat}, {lon}</p>
                     {f'<a href="{post_url}" target="_blank" style="display: block; margin-top: 12px; background: #0095f6; color: white; padding: 10px; text-align: center; text-decoration: none; border-radius: 8px; font-weight: 600; font-size: 14px;">View Full Post on Instagram →</a>' if post_url else ''}
                 </div>
@@ -135,7 +144,9 @@ def create_map(posts, output_file='social_media_map.html'):
             'timestamp': int(dt.timestamp() * 1000),
             'date': post_date,
             'id': marker_id,
-            'caption': post_caption.lower() if post_caption else ''
+            'caption': post_caption.lower() if post_caption else '',
+            'place': place_display.lower(),
+            'country': post['place']['country'] if post.get('place') else ''
         })
     
     # Save map
@@ -213,7 +224,7 @@ def create_map(posts, output_file='social_media_map.html'):
             margin-bottom: 8px;
             text-align: center;
         }}
-        #keyword-search {{
+        #keyword-search, #place-search, #country-select {{
             width: 100%;
             padding: 6px 8px;
             border: 1px solid #ddd;
@@ -222,7 +233,7 @@ def create_map(posts, output_file='social_media_map.html'):
             box-sizing: border-box;
             margin-bottom: 8px;
         }}
-        #keyword-search:focus {{
+        #keyword-search:focus, #place-search:focus, #country-select:focus {{
             outline: none;
             border-color: #E1306C;
         }}
@@ -242,6 +253,14 @@ def create_map(posts, output_file='social_media_map.html'):
             <input type="text" id="keyword-search" placeholder="Search captions...">
         </div>
         
+        <div style="margin-bottom: 10px;">
+            <div class="search-label">Place</div>
+            <input type="text" id="place-search" placeholder="Search cities or countries...">
+            <select id="country-select">
+                <option value="">All countries</option>
+            </select>
+        </div>
+        
         <div class="slider-container">
             <div class="slider-label">Start: <span class="slider-value" id="start-date-value"></span></div>
             <input type="range" id="start-slider" min="{min_timestamp}" max="{max_timestamp}" value="{min_timestamp}">
@@ -261,6 +280,8 @@ def create_map(posts, output_file='social_media_map.html'):
         const startDateValue = document.getElementById('start-date-value');
         const endDateValue = document.getElementById('end-date-value');
         const keywordSearch = document.getElementById('keyword-search');
+        const placeSearch = document.getElementById('place-search');
+        const countrySelect = document.getElementById('country-select');
         const stats = document.getElementById('stats');
         
         function formatDate(timestamp) {{
@@ -272,6 +293,8 @@ def create_map(posts, output_file='social_media_map.html'):
             const startTime = parseInt(startSlider.value);
             const endTime = parseInt(endSlider.value);
             const keyword = keywordSearch.value.toLowerCase().trim();
+            const placeKeyword = placeSearch.value.toLowerCase().trim();
+            const country = countrySelect.value;
             
             // Ensure start is always before end
             if (startTime > endTime) {{
@@ -302,7 +325,10 @@ def create_map(posts, output_file='social_media_map.html'):
                     // Check keyword match (if keyword is provided)
                     const matchesKeyword = !keyword || data.caption.includes(keyword);
                     
-                    if (inTimeRange && matchesKeyword) {{
+                    // Check reverse geocoded place (if a place or country is chosen)
+                    const matchesPlace = (!placeKeyword || data.place.includes(placeKeyword)) && (!country || data.country === country);
+                    
+                    if (inTimeRange && matchesKeyword && matchesPlace) {{
                         allMarkers[index].style.display = '';
                         visibleCount++;
                     }} else {{
@@ -317,6 +343,16 @@ def create_map(posts, output_file='social_media_map.html'):
         startSlider.addEventListener('input', updateMarkers);
         endSlider.addEventListener('input', updateMarkers);
         keywordSearch.addEventListener('input', updateMarkers);
+        placeSearch.addEventListener('input', updateMarkers);
+        countrySelect.addEventListener('change', updateMarkers);
+        
+        // Fill the country dropdown with the countries that have posts
+        [...new Set(markersData.map(data => data.country).filter(Boolean))].sort().forEach(name => {{
+            const option = document.createElement('option');
+            option.value = name;
+            option.textContent = name;
+            countrySelect.appendChild(option);
+        }});
         
         // Wait for map to fully load
         setTimeout(() => {{
@@ -344,6 +380,18 @@ def main():
         posts = load_posts(json_file)
         print(f"Loaded {len(posts)} posts")
         
+        # Label posts with city/country from the local gazetteer (offline, one batch query)
+        # and save them back so output.json carries the "place" field too
+        if os.path.exists(GAZETTEER_FILE):
+            try:
+                label_posts(posts, ReverseGeocoder.load())
+                with open(json_file, 'w', encoding='utf-8') as f:
+                    json.dump(posts, f, indent=2, ensure_ascii=False)
+            except ValueError as e:
+                print(f"{e}, skipping place labels")
+        else:
+            print(f"No gazetteer at {GAZETTEER_FILE}, skipping place labels")
+        
         output_file = create_map(posts)
         
         if output_file:
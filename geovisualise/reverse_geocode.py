@@ -0,0 +1,279 @@
+'''
+Offline reverse geocoding for post locations.
+
+1. Load a local GeoNames gazetteer (e.g. cities500.txt from https://download.geonames.org/export/dump/)
+2. Build a compact array-backed KD-tree over it and cache the arrays to disk as .npz
+3. Label every post with its nearest city and country in one batch query (no network)
+
+Points are stored as 3D unit vectors, so the nearest point in straight-line distance is
+also the nearest point on the globe.
+'''
+
+import json
+import os
+import numpy as np
+
+GAZETTEER_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer")
+GAZETTEER_FILE = os.path.join(GAZETTEER_FOLDER, "cities500.txt")
+COUNTRY_INFO_FILE = os.path.join(GAZETTEER_FOLDER, "countryInfo.txt")  # optional, for country names
+
+LEAF_SIZE = 64
+QUERY_CHUNK = 256  # queries per batch, bounds the size of the temporary arrays
+
+# GeoNames dump columns we need
+COL_NAME, COL_LAT, COL_LON, COL_FEATURE_CLASS, COL_COUNTRY = 1, 4, 5, 6, 8
+
+
+def to_unit_vectors(lat, lon):
+    """Convert lat/lon in degrees to (N, 3) points on the unit sphere"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def load_country_names(path=COUNTRY_INFO_FILE):
+    """Map ISO country code -> country name, if GeoNames' countryInfo.txt is available"""
+    names = {}
+    if not os.path.exists(path):
+        return names
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) > 4:
+                names[fields[0]] = fields[4]
+    return names
+
+
+def pack_strings(strings):
+    """
+    Store strings as one UTF-8 blob plus offsets, so each name costs its own length
+    instead of being padded to the longest one like a fixed-width numpy string array.
+    """
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum([len(raw) for raw in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_string(blob, offsets, i):
+    return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def load_gazetteer(path=GAZETTEER_FILE):
+    """
+    Read populated places (feature class P) from a GeoNames dump.
+    Returns (name_blob, name_offsets, country_codes, lats, lons), names packed by pack_strings.
+    """
+    names, countries, lats, lons = [], [], [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) <= COL_COUNTRY or fields[COL_FEATURE_CLASS] != "P":
+                continue
+            names.append(fields[COL_NAME])
+            countries.append(fields[COL_COUNTRY])
+            lats.append(float(fields[COL_LAT]))
+            lons.append(float(fields[COL_LON]))
+    name_blob, name_offsets = pack_strings(names)
+    return name_blob, name_offsets, np.array(countries, dtype="S2"), np.array(lats), np.array(lons)
+
+
+# Arrays that make up a KDTree, in the order its constructor takes them
+TREE_ARRAYS = ["points", "order", "node_start", "node_end", "node_left", "node_right",
+               "node_axis", "node_split", "node_lo", "node_hi"]
+
+
+class KDTree:
+    """
+    KD-tree stored as flat arrays. Points are reordered so every node covers a
+    contiguous slice, and each node keeps its split and bounding box. Leaves have
+    node_left == -1. Queries walk the tree for all query points at once.
+    """
+
+    def __init__(self, points, order, node_start, node_end, node_left, node_right,
+                 node_axis, node_split, node_lo, node_hi):
+        self.points = points          # (N, 3) float32, tree order
+        self.order = order            # (N,) index into the original gazetteer
+        self.node_start = node_start  # (M,) slice of points under each node
+        self.node_end = node_end
+        self.node_left = node_left    # (M,) child ids, -1 for leaves
+        self.node_right = node_right
+        self.node_axis = node_axis    # (M,) split axis and value for internal nodes
+        self.node_split = node_split
+        self.node_lo = node_lo        # (M, 3) bounding box min
+        self.node_hi = node_hi        # (M, 3) bounding box max
+        self.leaf_size = int((node_end - node_start)[node_left < 0].max())
+
+    @classmethod
+    def build(cls, points, leaf_size=LEAF_SIZE):
+        if len(points) == 0:
+            raise ValueError("Cannot build a KD-tree without points")
+
+        order = np.arange(len(points))
+        start, end, left, right, axes, splits = [0], [len(points)], [-1], [-1], [0], [0.0]
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            s, e = start[node], end[node]
+            if e - s <= leaf_size:
+                continue
+            chunk = points[order[s:e]]
+            # Split on the widest axis at the median
+            axis = int(np.argmax(chunk.max(axis=0) - chunk.min(axis=0)))
+            mid = (e - s) // 2
+            split = np.argpartition(chunk[:, axis], mid)
+            order[s:e] = order[s:e][split]
+
+            axes[node] = axis
+            splits[node] = points[order[s + mid], axis]
+            for child_start, child_end in ((s, s + mid), (s + mid, e)):
+                start.append(child_start)
+                end.append(child_end)
+                left.append(-1)
+                right.append(-1)
+                axes.append(0)
+                splits.append(0.0)
+            left[node], right[node] = len(start) - 2, len(start) - 1
+            stack += [left[node], right[node]]
+
+        ordered = points[order].astype(np.float32)
+        node_lo = np.array([ordered[s:e].min(axis=0) for s, e in zip(start, end)], dtype=np.float32)
+        node_hi = np.array([ordered[s:e].max(axis=0) for s, e in zip(start, end)], dtype=np.float32)
+        return cls(ordered, order, np.array(start), np.array(end), np.array(left), np.array(right),
+                   np.array(axes), np.array(splits, dtype=np.float32), node_lo, node_hi)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in TREE_ARRAYS}
+
+    def query(self, queries):
+        """Index (into the original points) of the nearest point for each query"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 3)
+        result = np.empty(len(queries), dtype=np.int64)
+        for start in range(0, len(queries), QUERY_CHUNK):
+            result[start:start + QUERY_CHUNK] = self._query_chunk(queries[start:start + QUERY_CHUNK])
+        return result
+
+    def _scan_leaves(self, queries, who, leaves, best_dist, best_index):
+        """Check every point of leaves[i] against queries[who[i]], keeping the closest"""
+        index = self.node_start[leaves][:, None] + np.arange(self.leaf_size)[None]
+        valid = index < self.node_end[leaves][:, None]
+        index = np.where(valid, index, 0)
+        dist = ((self.points[index] - queries[who][:, None]) ** 2).sum(axis=-1)
+        dist[~valid] = np.inf
+        nearest = dist.argmin(axis=1)
+        nearest_dist = dist[np.arange(len(who)), nearest]
+        nearest_index = index[np.arange(len(who)), nearest]
+        # A query can reach several leaves in one step: keep only its closest hit
+        ranked = np.lexsort((nearest_dist, who))
+        first = ranked[np.r_[True, who[ranked][1:] != who[ranked][:-1]]]
+        closer = first[nearest_dist[first] < best_dist[who[first]]]
+        best_dist[who[closer]] = nearest_dist[closer]
+        best_index[who[closer]] = nearest_index[closer]
+
+    def _query_chunk(self, queries):
+        n = len(queries)
+        best_dist = np.full(n, np.inf, dtype=np.float32)
+        best_index = np.zeros(n, dtype=np.int64)
+        rows = np.arange(n)
+
+        # 1. Descend to the leaf each query falls in, for a first nearest distance
+        node = np.zeros(n, dtype=np.int64)
+        while True:
+            inner = self.node_left[node] >= 0
+            if not inner.any():
+                break
+            at = node[inner]
+            go_right = queries[rows[inner], self.node_axis[at]] >= self.node_split[at]
+            node[inner] = np.where(go_right, self.node_right[at], self.node_left[at])
+        home_leaf = node
+        self._scan_leaves(queries, rows, home_leaf, best_dist, best_index)
+
+        # 2. Walk the tree level by level, dropping nodes whose box is farther than the best so far
+        who, node = rows, np.zeros(n, dtype=np.int64)
+        while len(who):
+            gap = np.maximum(self.node_lo[node] - queries[who], 0) + np.maximum(queries[who] - self.node_hi[node], 0)
+            keep = ((gap ** 2).sum(axis=-1) < best_dist[who]) & (node != home_leaf[who])
+            who, node = who[keep], node[keep]
+
+            leaf = self.node_left[node] < 0
+            if leaf.any():
+                self._scan_leaves(queries, who[leaf], node[leaf], best_dist, best_index)
+
+            inner = ~leaf
+            who = np.concatenate([who[inner], who[inner]])
+            node = np.concatenate([self.node_left[node[inner]], self.node_right[node[inner]]])
+
+        return self.order[best_index]
+
+
+class ReverseGeocoder:
+    """Nearest-city lookup over a gazetteer, cached next to it as <gazetteer>.npz"""
+
+    def __init__(self, tree, name_blob, name_offsets, country_codes, country_names):
+        self.tree = tree
+        self.name_blob = name_blob        # UTF-8 bytes of every name, see pack_strings
+        self.name_offsets = name_offsets  # (N + 1,) int32
+        self.country_codes = country_codes  # (N,) ISO codes as 2-byte strings
+        self.country_names = country_names
+
+    @classmethod
+    def load(cls, gazetteer_path=GAZETTEER_FILE, country_info_path=COUNTRY_INFO_FILE):
+        cache_path = os.path.splitext(gazetteer_path)[0] + ".npz"
+        country_names = load_country_names(country_info_path)
+
+        # Reuse the cache unless the gazetteer changed since it was built
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(gazetteer_path):
+            with np.load(cache_path) as cache:
+                tree = KDTree(*(cache[name] for name in TREE_ARRAYS))
+                return cls(tree, cache["name_blob"], cache["name_offsets"], cache["country_codes"], country_names)
+
+        print(f"Building reverse geocoding index from {gazetteer_path}...")
+        name_blob, name_offsets, country_codes, lats, lons = load_gazetteer(gazetteer_path)
+        if len(lats) == 0:
+            raise ValueError(f"No populated places found in {gazetteer_path}")
+        tree = KDTree.build(to_unit_vectors(lats, lons))
+        np.savez_compressed(cache_path, name_blob=name_blob, name_offsets=name_offsets,
+                            country_codes=country_codes, **tree.arrays())
+        return cls(tree, name_blob, name_offsets, country_codes, country_names)
+
+    def lookup(self, lats, lons):
+        """Return a place dict for every lat/lon pair, in one batch"""
+        nearest = self.tree.query(to_unit_vectors(lats, lons))
+        places = []
+        for i in nearest:
+            code = self.country_codes[i].decode("ascii")
+            places.append({
+                "city": unpack_string(self.name_blob, self.name_offsets, i),
+                "country_code": code,
+                "country": self.country_names.get(code, code),
+            })
+        return places
+
+
+def label_posts(posts, geocoder):
+    """Add a "place" field to every post that has coordinates"""
+    located = [post for post in posts
+               if isinstance(post.get("location"), dict) and post["location"].get("lat") is not None]
+    if not located:
+        return posts
+
+    places = geocoder.lookup([post["location"]["lat"] for post in located],
+                             [post["location"]["lon"] for post in located])
+    for post, place in zip(located, places):
+        post["place"] = place
+    return posts
+
+
+if __name__ == "__main__":
+    # Label output.json in place
+    json_file = "output.json"
+    with open(json_file, "r", encoding="utf-8") as f:
+        posts = json.load(f)
+
+    label_posts(posts, ReverseGeocoder.load())
+
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(posts, f, indent=2, ensure_ascii=False)
+    print(f"Labelled posts saved to {json_file}")
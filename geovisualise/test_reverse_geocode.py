@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from reverse_geocode import LEAF_SIZE, KDTree, ReverseGeocoder, to_unit_vectors
+
+
+def random_points(rng, n):
+    # Uniform on the sphere
+    return to_unit_vectors(np.degrees(np.arcsin(rng.uniform(-1, 1, n))), rng.uniform(-180, 180, n))
+
+
+def assert_matches_brute_force(points, queries):
+    points = points.astype(np.float32)
+    queries = queries.astype(np.float32)
+    found = KDTree.build(points).query(queries)
+
+    brute = ((points[None] - queries[:, None]) ** 2).sum(axis=-1)
+    # Compare distances, so ties between equally near points do not matter
+    assert np.allclose(brute[np.arange(len(queries)), found], brute.min(axis=1), atol=1e-7)
+
+
+@pytest.mark.parametrize("n", [1, LEAF_SIZE, LEAF_SIZE + 1, 5000])
+def test_query_matches_brute_force_random(n):
+    rng = np.random.default_rng(n)
+    assert_matches_brute_force(random_points(rng, n), random_points(rng, 500))
+
+
+def test_query_matches_brute_force_duplicates():
+    rng = np.random.default_rng(0)
+    points = np.repeat(random_points(rng, 20), 10, axis=0)
+    assert_matches_brute_force(points, np.concatenate([points[::7], random_points(rng, 200)]))
+
+
+def test_query_matches_brute_force_clustered():
+    rng = np.random.default_rng(1)
+    # A few dense clusters around cities, like a real gazetteer
+    centres = rng.uniform([-60, -180], [70, 180], size=(5, 2))
+    lat = np.concatenate([c[0] + rng.normal(0, 0.05, 400) for c in centres])
+    lon = np.concatenate([c[1] + rng.normal(0, 0.05, 400) for c in centres])
+    queries = to_unit_vectors(centres[:, 0].repeat(40) + rng.normal(0, 0.2, 200),
+                              centres[:, 1].repeat(40) + rng.normal(0, 0.2, 200))
+    assert_matches_brute_force(to_unit_vectors(lat, lon), np.concatenate([queries, random_points(rng, 100)]))
+
+
+def test_build_without_points_raises():
+    with pytest.raises(ValueError):
+        KDTree.build(np.zeros((0, 3)))
+
+
+def write_gazetteer(path, rows):
+    # GeoNames dump: 19 tab separated columns
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (name, lat, lon, feature_class, country) in enumerate(rows):
+            f.write("\t".join([str(i), name, name, "", str(lat), str(lon), feature_class, "PPL", country] + [""] * 10) + "\n")
+
+
+def test_load_builds_cache_and_reuses_it(tmp_path, capsys):
+    gazetteer = tmp_path / "cities.txt"
+    write_gazetteer(gazetteer, [
+        ("Singapore", 1.2897, 103.8501, "P", "SG"),
+        ("São Paulo", -23.5475, -46.6361, "P", "BR"),
+        ("Mount Everest", 27.9881, 86.9250, "T", "NP"),
+        ("Zürich", 47.3667, 8.55, "P", "CH"),
+    ])
+    country_info = tmp_path / "countryInfo.txt"
+    country_info.write_text("#ISO\tISO3\tISO-Numeric\tfips\tCountry\nSG\tSGP\t702\tSN\tSingapore\n", encoding="utf-8")
+
+    first = ReverseGeocoder.load(str(gazetteer), str(country_info))
+    cache = tmp_path / "cities.npz"
+    assert cache.exists()
+    assert "Building" in capsys.readouterr().out
+    cache_mtime = os.path.getmtime(cache)
+
+    second = ReverseGeocoder.load(str(gazetteer), str(country_info))
+    assert "Building" not in capsys.readouterr().out
+    assert os.path.getmtime(cache) == cache_mtime
+
+    lats, lons = [1.3, -23.0, 47.0, 28.0], [103.8, -46.0, 8.0, 87.0]
+    expected = [
+        {"city": "Singapore", "country_code": "SG", "country": "Singapore"},
+        {"city": "São Paulo", "country_code": "BR", "country": "BR"},
+        {"city": "Zürich", "country_code": "CH", "country": "CH"},
+        {"city": "Singapore", "country_code": "SG", "country": "Singapore"},  # Everest is not a populated place
+    ]
+    assert first.lookup(lats, lons) == expected
+    assert second.lookup(lats, lons) == expected
+
+
+def test_load_without_populated_places_raises(tmp_path):
+    gazetteer = tmp_path / "empty.txt"
+    write_gazetteer(gazetteer, [("Mount Everest", 27.9881, 86.9250, "T", "NP")])
+
+    with pytest.raises(ValueError):
+        ReverseGeocoder.load(str(gazetteer), str(tmp_path / "missing.txt"))
@@ -0,0 +1,209 @@
+'''
+Download policy for the scraper.
+
+Posts that already carry a geotag (post.location) never go through GeoCLIP, so the
+only thing we need their images for is the popup preview on the map. For those posts
+we fetch the smallest rendition that is still big enough for the popup. The full-size
+images can be fetched later by shortcode (see fetch_deferred.py) if a stage needs them.
+
+Everything here works on plain "post" objects and a fetch(url) -> bytes callable, so
+it can be driven by instaloader or by a fake post source.
+'''
+
+import os
+from collections import namedtuple
+from urllib.parse import urlparse
+
+# One rendition of an image (Instagram serves several sizes of the same picture)
+MediaCandidate = namedtuple("MediaCandidate", ["url", "width", "height"])
+
+# One image of a post: the full-size URL and size (0 if unknown) plus every rendition we know about
+MediaItem = namedtuple("MediaItem", ["full_url", "candidates", "width", "height"], defaults=(0, 0))
+
+PREVIEW = "preview"
+FULL = "full"
+
+# The map popup is 400px wide, so anything around 640px still looks sharp
+DEFAULT_PREVIEW_WIDTH = 640
+
+
+def _candidates_from_node(node):
+    """Collect every rendition listed in a raw Instagram media node"""
+    candidates = []
+    # Timeline nodes often only carry thumbnail_resources (150-640px), which is popup size anyway
+    for res in node.get("thumbnail_resources") or []:
+        candidates.append(MediaCandidate(res["src"], res.get("config_width", 0), res.get("config_height", 0)))
+    for res in node.get("display_resources") or []:
+        candidates.append(MediaCandidate(res["src"], res.get("config_width", 0), res.get("config_height", 0)))
+    for res in (node.get("image_versions2") or {}).get("candidates") or []:
+        candidates.append(MediaCandidate(res["url"], res.get("width", 0), res.get("height", 0)))
+    return candidates
+
+
+def _item_from_node(full_url, node):
+    dimensions = node.get("dimensions") or {}
+    width = dimensions.get("width") or node.get("original_width") or 0
+    height = dimensions.get("height") or node.get("original_height") or 0
+    return MediaItem(full_url, _candidates_from_node(node), width, height)
+
+
+def instaloader_media(post):
+    """
+    List the image items of an instaloader Post (videos are skipped, same as before).
+    Renditions come from the raw node; if they are missing we only know the full URL.
+    """
+    if post.typename == "GraphSidecar":
+        try:
+            raw_nodes = [edge["node"] for edge in post._field("edge_sidecar_to_children", "edges")]
+        except Exception:
+            raw_nodes = []
+
+        items = []
+        for index, node in enumerate(post.get_sidecar_nodes()):
+            if node.is_video:
+                continue
+            raw = raw_nodes[index] if index < len(raw_nodes) else {}
+            items.append(_item_from_node(node.display_url, raw))
+        return items
+
+    if post.is_video:
+        return []
+    return [_item_from_node(post.url, post._node)]
+
+
+class DownloadStats:
+    """Running totals for one scraper run"""
+
+    def __init__(self):
+        self.full_posts = 0
+        self.preview_posts = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def as_dict(self):
+        return {
+            "full_posts": self.full_posts,
+            "preview_posts": self.preview_posts,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class DownloadPolicy:
+    """
+    Decides which rendition to fetch for each post.
+    Geotagged posts get a preview, everything else (GeoCLIP input) gets full size.
+    """
+
+    def __init__(self, preview_width=DEFAULT_PREVIEW_WIDTH, defer_geotagged=True):
+        self.preview_width = preview_width
+        self.defer_geotagged = defer_geotagged
+
+    def quality_for(self, post):
+        # A location without coordinates still goes to GeoCLIP, so it needs full size
+        location = post.location
+        if self.defer_geotagged and location and location.lat is not None and location.lng is not None:
+            return PREVIEW
+        return FULL
+
+    def pick_preview(self, item):
+        """Smallest rendition that is at least preview_width wide, else the largest one"""
+        if not item.candidates:
+            return None
+        big_enough = [c for c in item.candidates if c.width >= self.preview_width]
+        if big_enough:
+            return min(big_enough, key=lambda c: c.width)
+        return max(item.candidates, key=lambda c: c.width)
+
+
+def _full_area(item):
+    if item.width and item.height:
+        return item.width * item.height
+    largest = max(item.candidates, key=lambda c: c.width * c.height)
+    return largest.width * largest.height
+
+
+def _is_smaller(item, candidate):
+    """True if the rendition is a genuinely smaller image than the full-size one"""
+    if candidate is None or candidate.url == item.full_url:
+        return False
+    return candidate.width * candidate.height < _full_area(item)
+
+
+def _estimate_full_bytes(item, chosen, chosen_bytes):
+    """Scale the preview size by pixel area to estimate what the full image would cost"""
+    preview_area = chosen.width * chosen.height
+    if not preview_area:
+        return chosen_bytes
+    return max(chosen_bytes, int(chosen_bytes * _full_area(item) / preview_area))
+
+
+def _extension(url):
+    extension = os.path.splitext(urlparse(url).path)[1].lower()
+    return extension if extension in (".jpg", ".jpeg", ".png", ".webp") else ".jpg"
+
+
+def download_post_media(post, items, policy, fetch, dest_folder, stats):
+    """
+    Fetch the images of one post according to the policy.
+    Returns (saved_paths, quality). Files are named Shortcode_1.jpg, Shortcode_2.jpg...
+    A post only counts as "preview" if every image has a smaller rendition; otherwise
+    the whole post is fetched full size so the label matches what is on disk.
+    """
+    chosen = [None] * len(items)
+    if policy.quality_for(post) == PREVIEW:
+        previews = [policy.pick_preview(item) for item in items]
+        if items and all(_is_smaller(item, c) for item, c in zip(items, previews)):
+            chosen = previews
+    quality = PREVIEW if items and all(chosen) else FULL
+
+    saved_paths = []
+    for index, (item, preview) in enumerate(zip(items, chosen)):
+        url = preview.url if preview else item.full_url
+
+        data = fetch(url)
+
+        new_filename = f"{post.shortcode}_{index + 1}{_extension(url)}"
+        destination_path = os.path.join(dest_folder, new_filename)
+        with open(destination_path, "wb") as f:
+            f.write(data)
+
+        saved_paths.append(destination_path)
+        stats.bytes_downloaded += len(data)
+        if preview:
+            stats.bytes_saved += _estimate_full_bytes(item, preview, len(data)) - len(data)
+
+    if quality == PREVIEW:
+        stats.preview_posts += 1
+    else:
+        stats.full_posts += 1
+
+    return saved_paths, quality
+
+
+def shortcode_from_url(post_url):
+    return post_url.rstrip("/").split("/")[-1]
+
+
+def fetch_deferred_media(entry, resolve, fetch, dest_folder, stats):
+    """
+    Replace the preview images of a post entry with the full-size ones.
+    Instagram CDN URLs expire, so the post is looked up again by shortcode with
+    resolve(shortcode) -> post to get fresh URLs. Returns the new paths, or None if
+    the entry was already full size.
+    """
+    if entry.get("media_quality") != PREVIEW:
+        return None
+
+    post = resolve(shortcode_from_url(entry["post_url"]))
+    new_paths = download_post_media(post, instaloader_media(post), DownloadPolicy(defer_geotagged=False),
+                                    fetch, dest_folder, stats)[0]
+
+    # Full-size files may have a different extension, drop previews that were not overwritten
+    for old_path in entry["local_image_paths"]:
+        old_file = os.path.join(dest_folder, os.path.basename(old_path))
+        if old_file not in new_paths and os.path.exists(old_file):
+            os.remove(old_file)
+
+    entry["media_quality"] = FULL
+    return new_paths
@@ -0,0 +1,53 @@
+'''
+Fetch the full-size images that instascraper.py deferred for geotagged posts.
+
+Each "preview" post in posts.json is looked up again by shortcode, so the CDN URLs are
+fresh, and its preview images are replaced with the full-size ones.
+Run from inside instascraper/, same as instascraper.py.
+'''
+
+import instaloader
+import json
+import os
+from download_policy import DownloadStats, fetch_deferred_media
+
+# --- CONFIGURATION ---
+ROOT_OUTPUT_FOLDER = "output" # Main folder
+IMAGES_FOLDER = "images"                # Subfolder for JPGs
+JSON_FOLDER = "json"                    # Subfolder for JSONs
+OUTPUT_FILENAME = "posts.json"
+# ---------------------
+
+final_img_path = os.path.join(ROOT_OUTPUT_FOLDER, IMAGES_FOLDER)
+output_file_path = os.path.join(ROOT_OUTPUT_FOLDER, JSON_FOLDER, OUTPUT_FILENAME)
+
+L = instaloader.Instaloader()
+stats = DownloadStats()
+
+def resolve(shortcode):
+    return instaloader.Post.from_shortcode(L.context, shortcode)
+
+def fetch(url):
+    return L.context.get_raw(url).content
+
+with open(output_file_path, 'r', encoding='utf-8') as f:
+    all_posts_data = json.load(f)
+
+for post_data in all_posts_data:
+    try:
+        new_paths = fetch_deferred_media(post_data, resolve, fetch, final_img_path, stats)
+    except Exception as e:
+        print(f"[!] Error fetching full-size media for {post_data['post_url']}: {e}")
+        continue
+
+    if new_paths is None:
+        continue
+
+    post_data["local_image_paths"] = [os.path.join("instascraper", path) for path in new_paths]
+    print(f"[OK] Full-size media for {post_data['post_url']}")
+
+    # Save after every post so a crash halfway through keeps what was fetched
+    with open(output_file_path, 'w', encoding='utf-8') as f:
+        json.dump(all_posts_data, f, indent=4, ensure_ascii=False)
+
+print(f"[-] {stats.full_posts} posts upgraded, {stats.bytes_downloaded / 1e6:.1f} MB downloaded.")
@@ -1,11 +1,10 @@
 import instaloader
 import json
 import os
-import shutil
-import glob
 from datetime import datetime
 from itertools import takewhile, dropwhile, islice
 import argparse
+from download_policy import DownloadPolicy, DownloadStats, download_post_media, instaloader_media
 
 # 1. Initialize the parser
 parser = argparse.ArgumentParser(description="My Downloader Script")
@@ -15,6 +14,7 @@ parser = argparse.ArgumentParser(description="My Downloader Script")
 #    - type=str: It expects text
 #    - required=True: The script will crash if you don't provide it
 parser.add_argument("--target", type=str, required=True, help="The username to scrape")
+parser.add_argument("--full-media", action="store_true", help="Download full-size images even for geotagged posts")
 
 # 3. Parse the arguments
 args = parser.parse_args()
@@ -27,15 +27,15 @@ ROOT_OUTPUT_FOLDER = "output" # Main folder
 IMAGES_FOLDER = "images"                # Subfolder for JPGs
 JSON_FOLDER = "json"                    # Subfolder for JSONs
 OUTPUT_FILENAME = "posts.json"
-TEMP_FOLDER = "temp" # A temporary holding area
+STATS_FILENAME = "download_stats.json"  # Bytes downloaded/saved, one entry per run
 # ---------------------
 
 final_img_path = os.path.join(ROOT_OUTPUT_FOLDER, IMAGES_FOLDER)
 final_json_path = os.path.join(ROOT_OUTPUT_FOLDER, JSON_FOLDER)
 output_file_path = os.path.join(final_json_path, OUTPUT_FILENAME)
-temp_path = TEMP_FOLDER
+stats_file_path = os.path.join(final_json_path, STATS_FILENAME)
 
-for p in [final_img_path, final_json_path, temp_path]:
+for p in [final_img_path, final_json_path]:
     os.makedirs(p, exist_ok=True)
 
 # 2. Configure Instaloader
@@ -57,48 +57,35 @@ posts = islice(instaloader.Profile.from_username(L.context, target_username).get
 
 # for post in takewhile(lambda p: p.date > UNTIL, dropwhile(lambda p: p.date > SINCE, posts)):
 
+# Geotagged posts only need a popup preview, so full-size downloads are deferred for them
+policy = DownloadPolicy(defer_geotagged=not args.full_media)
+stats = DownloadStats()
+
+def fetch(url):
+    return L.context.get_raw(url).content
+
 all_posts_data = []
 for post in posts:
-    # A. Clean the temp folder to ensure it's empty
-    for file in os.listdir(temp_path):
-        os.remove(os.path.join(temp_path, file))
-
-    # B. Download into the TEMP folder    
+    # A. Work out which images this post has (video posts have none, SKIP THEM)
     try:
-        did_download = L.download_post(post, target=temp_path)
+        media_items = instaloader_media(post)
     except Exception as e:
-        print(f"[!] Error downloading {post.shortcode}: {e}")
+        print(f"[!] Error reading {post.shortcode}: {e}")
         continue
-    
-    # C. Find the downloaded image file(s) in the temp folder
-    downloaded_files = glob.glob(os.path.join(temp_path, "*"))
-    
-    # Filter for media files only (ignore potential leftover metadata if settings changed)
-    image_files = [f for f in downloaded_files if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-
-    # If list is empty (meaning it was a video post), SKIP IT.
-    if not image_files:
+
+    if not media_items:
         continue
 
-    saved_paths = []
-
-    # D. Loop through ALL files found (Handling Sidecars)
-    saved_paths = []
-    for index, source_file in enumerate(sorted(image_files)):
-        # 1. Get extension (.jpg)
-        extension = os.path.splitext(source_file)[1]
-        
-        # 2. Generate unique name: Shortcode_1.jpg, Shortcode_2.jpg...
-        new_filename = f"{post.shortcode}_{index + 1}{extension}"
-        destination_path = os.path.join(final_img_path, new_filename)
-        
-        # 3. Move file
-        shutil.move(source_file, destination_path)
-        
-        # 4. Add to list
-        relative_path = os.path.join(final_img_path, new_filename)
-        saved_paths.append(os.path.join("instascraper", relative_path))
+    # B. Download straight into the images folder, preview or full size depending on the policy
+    try:
+        image_files, media_quality = download_post_media(
+            post, media_items, policy, fetch, final_img_path, stats
+        )
+    except Exception as e:
+        print(f"[!] Error downloading {post.shortcode}: {e}")
+        continue
 
+    saved_paths = [os.path.join("instascraper", path) for path in image_files]
 
     # E. Create JSON with the VERIFIED path
     # Get location data
@@ -111,6 +98,7 @@ for post in posts:
         "local_image_paths": saved_paths,
         "date": str(post.date_local),
         "caption": post.caption if post.caption else "", # The main text
+        "media_quality": media_quality, # "preview" if the full-size download was deferred
         "location": {
             "lat": location[0],
             "lon": location[1],
@@ -124,6 +112,15 @@ for post in posts:
     with open(output_file_path, 'w', encoding='utf-8') as f:
         json.dump(all_posts_data, f, indent=4, ensure_ascii=False)
 
-if os.path.exists(temp_path):
-    shutil.rmtree(temp_path)
-    print("[-] Temp folder cleaned up.")
\ No newline at end of file
+# F. Record how much bandwidth the download policy saved this run
+run_stats = {"target": target_username, "run_at": datetime.now().isoformat(timespec="seconds"), **stats.as_dict()}
+all_runs = []
+if os.path.exists(stats_file_path):
+    with open(stats_file_path, 'r', encoding='utf-8') as f:
+        all_runs = json.load(f)
+all_runs.append(run_stats)
+with open(stats_file_path, 'w', encoding='utf-8') as f:
+    json.dump(all_runs, f, indent=4)
+
+print(f"[-] {stats.preview_posts} preview / {stats.full_posts} full posts, "
+      f"{stats.bytes_downloaded / 1e6:.1f} MB downloaded, ~{stats.bytes_saved / 1e6:.1f} MB saved.")
@@ -0,0 +1,153 @@
+import os
+
+from download_policy import (
+    FULL, PREVIEW, DownloadPolicy, DownloadStats, MediaCandidate, MediaItem, download_post_media,
+    fetch_deferred_media, instaloader_media,
+)
+
+
+class FakeLocation:
+    lat, lng = 1.3, 103.8
+
+
+class FakePost:
+    def __init__(self, shortcode, location=None):
+        self.shortcode = shortcode
+        self.location = location
+
+
+def fake_fetch(url):
+    # Pretend every pixel costs a byte, so sizes are easy to check
+    return {"small.jpg": b"s" * 150 * 150, "popup.jpg": b"p" * 640 * 640}.get(url.rsplit("/", 1)[1], b"f" * 1000)
+
+
+ITEM = MediaItem(
+    "https://cdn/full.jpg",
+    [MediaCandidate("https://cdn/small.jpg", 150, 150), MediaCandidate("https://cdn/popup.jpg", 640, 640)],
+    1080, 1080,
+)
+
+
+def test_geotagged_post_gets_popup_preview(tmp_path):
+    stats = DownloadStats()
+    paths, quality = download_post_media(FakePost("ABC", FakeLocation()), [ITEM], DownloadPolicy(), fake_fetch, tmp_path, stats)
+
+    assert quality == PREVIEW
+    assert (tmp_path / "ABC_1.jpg").read_bytes() == b"p" * 640 * 640
+    assert stats.preview_posts == 1 and stats.full_posts == 0
+    assert stats.bytes_downloaded == 640 * 640
+    assert stats.bytes_saved == 1080 * 1080 - 640 * 640
+
+
+def test_post_without_location_gets_full_size(tmp_path):
+    stats = DownloadStats()
+    paths, quality = download_post_media(FakePost("ABC"), [ITEM], DownloadPolicy(), fake_fetch, tmp_path, stats)
+
+    assert quality == FULL
+    assert (tmp_path / "ABC_1.jpg").read_bytes() == b"f" * 1000
+    assert stats.full_posts == 1 and stats.bytes_saved == 0
+
+
+def test_post_without_renditions_is_labelled_full(tmp_path):
+    stats = DownloadStats()
+    items = [ITEM, MediaItem("https://cdn/other.jpg", [])]
+    paths, quality = download_post_media(FakePost("ABC", FakeLocation()), items, DownloadPolicy(), fake_fetch, tmp_path, stats)
+
+    assert quality == FULL
+    assert len(paths) == 2
+    assert stats.full_posts == 1 and stats.preview_posts == 0
+    assert stats.bytes_downloaded == 2000 and stats.bytes_saved == 0
+
+
+class FakeLocationWithoutCoordinates:
+    lat, lng = None, None
+
+
+def test_location_without_coordinates_gets_full_size(tmp_path):
+    stats = DownloadStats()
+    post = FakePost("ABC", FakeLocationWithoutCoordinates())
+    paths, quality = download_post_media(post, [ITEM], DownloadPolicy(), fake_fetch, tmp_path, stats)
+
+    assert quality == FULL
+    assert (tmp_path / "ABC_1.jpg").read_bytes() == b"f" * 1000
+    assert stats.full_posts == 1 and stats.preview_posts == 0
+
+
+class FakeSidecarNode:
+    def __init__(self, display_url, is_video=False):
+        self.display_url = display_url
+        self.is_video = is_video
+
+
+class FakeInstaloaderPost:
+    """Just enough of instaloader.Post for instaloader_media"""
+
+    def __init__(self, shortcode, typename="GraphImage", url="", node=None, sidecar=None, raw_children=None):
+        self.shortcode = shortcode
+        self.location = None
+        self.typename = typename
+        self.is_video = False
+        self.url = url
+        self._node = node or {}
+        self._sidecar = sidecar or []
+        self._raw_children = raw_children or []
+
+    def get_sidecar_nodes(self):
+        return iter(self._sidecar)
+
+    def _field(self, *keys):
+        assert keys == ("edge_sidecar_to_children", "edges")
+        return [{"node": raw} for raw in self._raw_children]
+
+
+def raw_node(name, width, height):
+    return {
+        "dimensions": {"width": width, "height": height},
+        "thumbnail_resources": [{"src": f"https://cdn/{name}_thumb.jpg", "config_width": 640, "config_height": 640}],
+    }
+
+
+def test_sidecar_with_video_maps_images_to_their_own_raw_nodes():
+    post = FakeInstaloaderPost(
+        "ABC", typename="GraphSidecar",
+        sidecar=[FakeSidecarNode("https://cdn/a.jpg"), FakeSidecarNode("https://cdn/v.jpg", is_video=True),
+                 FakeSidecarNode("https://cdn/c.jpg")],
+        raw_children=[raw_node("a", 1080, 1350), raw_node("v", 720, 720), raw_node("c", 1440, 1080)],
+    )
+
+    items = instaloader_media(post)
+
+    assert [item.full_url for item in items] == ["https://cdn/a.jpg", "https://cdn/c.jpg"]
+    assert [(item.width, item.height) for item in items] == [(1080, 1350), (1440, 1080)]
+    assert [item.candidates[0].url for item in items] == ["https://cdn/a_thumb.jpg", "https://cdn/c_thumb.jpg"]
+
+
+def test_fetch_deferred_media_replaces_preview_with_full_size(tmp_path):
+    (tmp_path / "ABC_1.jpg").write_bytes(b"preview")
+    entry = {
+        "post_url": "https://www.instagram.com/p/ABC/",
+        "media_quality": PREVIEW,
+        "local_image_paths": ["instascraper/output/images/ABC_1.jpg"],
+    }
+    resolved = []
+
+    def resolve(shortcode):
+        resolved.append(shortcode)
+        return FakeInstaloaderPost(shortcode, url="https://cdn/full.png", node=raw_node("full", 1080, 1080))
+
+    new_paths = fetch_deferred_media(entry, resolve, lambda url: b"full", tmp_path, DownloadStats())
+
+    assert resolved == ["ABC"]
+    assert new_paths == [os.path.join(tmp_path, "ABC_1.png")]
+    assert (tmp_path / "ABC_1.png").read_bytes() == b"full"
+    assert not (tmp_path / "ABC_1.jpg").exists()
+    assert entry["media_quality"] == FULL
+
+
+def test_fetch_deferred_media_skips_full_entries(tmp_path):
+    entry = {"post_url": "https://www.instagram.com/p/ABC/", "media_quality": FULL, "local_image_paths": []}
+
+    def resolve(shortcode):
+        raise AssertionError("full entries should not be looked up again")
+
+    assert fetch_deferred_media(entry, resolve, fake_fetch, tmp_path, DownloadStats()) is None